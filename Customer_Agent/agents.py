@@ -11,7 +11,7 @@ class Agent:
 
 from tools import (
     get_customer_profile_tool, analyze_plan_suitability_tool, recommend_best_plans_tool,
-    search_telco_knowledge_tool, calculate_roaming_costs_tool
+    search_telco_knowledge_tool, calculate_roaming_costs_tool, optimize_plan_bundle_tool
 )
 
 # Triage Agent - Routes requests to appropriate specialists
@@ -48,12 +48,13 @@ plan_recommendation_agent = Agent(
     1. Get customer profile first using get_customer_profile
     2. Use recommend_best_plans to get recommendations
     3. Analyze each recommended plan's suitability
-    4. Provide clear reasoning for recommendations
-    5. Mention when you're using retrieved information from knowledge base
+    4. Use optimize_plan_bundle to check whether add-ons make a cheaper bundle
+    5. Provide clear reasoning for recommendations
+    6. Mention when you're using retrieved information from knowledge base
     
     Be thorough but concise. Focus on value and savings potential.
     """,
-    tools=[get_customer_profile_tool, analyze_plan_suitability_tool, recommend_best_plans_tool, search_telco_knowledge_tool],
+    tools=[get_customer_profile_tool, analyze_plan_suitability_tool, recommend_best_plans_tool, search_telco_knowledge_tool, optimize_plan_bundle_tool],
     model="gpt-4o"
 )
 
@@ -71,12 +72,13 @@ roaming_specialist_agent = Agent(
     1. Get customer profile to understand their usage patterns
     2. Use calculate_roaming_costs for cost estimates
     3. Search knowledge base for roaming policies
-    4. Clearly indicate when information comes from RAG retrieval
-    5. Provide actionable recommendations
+    4. Use optimize_plan_bundle with the planned trips to compare roaming packs and plans
+    5. Clearly indicate when information comes from RAG retrieval
+    6. Provide actionable recommendations
     
     Focus on helping customers avoid bill shock and optimize their international usage.
     """,
-    tools=[get_customer_profile_tool, calculate_roaming_costs_tool, search_telco_knowledge_tool],
+    tools=[get_customer_profile_tool, calculate_roaming_costs_tool, search_telco_knowledge_tool, optimize_plan_bundle_tool],
     model="gpt-4o"
 )
 
@@ -0,0 +1,390 @@
+import itertools
+import math
+import random
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from models import AddOn, CustomerProfile, PlanBundle, TelcoPlan, Trip, UsagePattern
+from mock_data import ADDON_CATALOG, MOCK_CUSTOMERS, TELCO_PLANS
+
+# Pay-per-use charges for usage a bundle does not cover (shared with tools.py)
+DATA_OVERAGE_PER_GB = 10.0
+DEFAULT_ROAMING_RATE = 0.20
+
+# Regions with plan roaming rates; trips elsewhere pay DEFAULT_ROAMING_RATE
+ROAMING_REGIONS = sorted({region for plan in TELCO_PLANS for region in plan.roaming_rates})
+
+# (addon_id, units covered, cost, max quantity)
+CoverItem = Tuple[str, int, float, int]
+
+def _daily_usage(customer: CustomerProfile) -> float:
+    return customer.usage_pattern.monthly_data_gb / 30
+
+def _covers_usage(customer: CustomerProfile, plan: TelcoPlan) -> bool:
+    """
+    Whether the plan itself covers the customer's minutes, SMS and international
+    calling. There are no add-ons or pay-per-use rates for these, so plans that
+    fall short are excluded rather than priced.
+
+    Usage is account-wide and every line brings the plan's allowances, so the
+    allowances are pooled across customer.lines.
+    """
+    usage = customer.usage_pattern
+    if usage.monthly_minutes > plan.minutes_included * customer.lines:
+        return False
+    if usage.monthly_sms > plan.sms_included * customer.lines:
+        return False
+    return plan.international_included or not usage.international_usage
+
+def _data_need(customer: CustomerProfile, plan: TelcoPlan) -> float:
+    """Account data usage beyond the plan allowance pooled across all lines"""
+    if plan.data_allowance_gb == float('inf'):
+        return 0.0
+    return max(0.0, customer.usage_pattern.monthly_data_gb - plan.data_allowance_gb * customer.lines)
+
+def _trip_days_by_region(trips: Iterable[Trip]) -> Dict[str, int]:
+    days = defaultdict(int)
+    for trip in trips:
+        days[trip.region] += trip.days
+    return dict(days)
+
+def _prune_cover_items(items: List[CoverItem], need: float, penalty: float, cap: int) -> List[CoverItem]:
+    """
+    Drop add-ons that can never lower the cost of covering need units.
+
+    An add-on costing at least the pay-per-use charge of what it covers is
+    never worth buying, and among add-ons of the same (capped) size only the
+    cheapest copies needed to reach the cap are kept.
+    """
+    by_units = defaultdict(list)
+    for addon_id, units, cost, max_qty in items:
+        if units <= 0 or max_qty <= 0:
+            continue
+        if cost >= min(units, need) * penalty:
+            continue
+        by_units[min(units, cap)].append((addon_id, cost, max_qty))
+
+    pruned = []
+    for units, candidates in by_units.items():
+        useful_qty = math.ceil(cap / units)
+        candidates.sort(key=lambda c: c[1])
+        for addon_id, cost, max_qty in candidates:
+            if useful_qty <= 0:
+                break
+            qty = min(max_qty, useful_qty)
+            pruned.append((addon_id, units, cost, qty))
+            useful_qty -= qty
+    return pruned
+
+def _min_cost_cover(items: List[CoverItem], need: float, penalty: float) -> Tuple[float, float, Dict[str, int]]:
+    """
+    Cheapest way to cover need units with bounded-quantity add-ons, where any
+    uncovered unit is charged at penalty.
+
+    Solved as a 0/1 knapsack DP over covered units (capped at ceil(need)),
+    with quantities binary-split into pieces.
+
+    Returns:
+        (add-on cost, pay-per-use cost, {addon_id: quantity})
+    """
+    if need <= 0:
+        return 0.0, 0.0, {}
+    if penalty <= 0:
+        return 0.0, 0.0, {}
+
+    cap = math.ceil(need)
+    pieces = []
+    for addon_id, units, cost, qty in _prune_cover_items(items, need, penalty, cap):
+        chunk = 1
+        while qty > 0:
+            take = min(chunk, qty)
+            pieces.append((addon_id, min(units * take, cap), cost * take, take))
+            qty -= take
+            chunk *= 2
+
+    dp = [0.0] + [float('inf')] * cap
+    parents = []
+    for _, units, cost, _ in pieces:
+        parent = [-1] * (cap + 1)
+        for covered in range(cap, -1, -1):
+            if dp[covered] == float('inf'):
+                continue
+            target = min(covered + units, cap)
+            if dp[covered] + cost < dp[target]:
+                dp[target] = dp[covered] + cost
+                parent[target] = covered
+        parents.append(parent)
+
+    best_state, best_total = 0, float('inf')
+    for covered in range(cap + 1):
+        total = dp[covered] + max(0.0, need - covered) * penalty
+        if total < best_total:
+            best_state, best_total = covered, total
+
+    selection = defaultdict(int)
+    state = best_state
+    for piece, parent in zip(reversed(pieces), reversed(parents)):
+        if parent[state] != -1:
+            selection[piece[0]] += piece[3]
+            state = parent[state]
+
+    addon_cost = dp[best_state]
+    return addon_cost, best_total - addon_cost, dict(selection)
+
+def _line_cost(plan: TelcoPlan, lines: int, discounts: List[AddOn]) -> Tuple[float, Optional[AddOn]]:
+    """Plan cost for every line, using the best applicable multi-line discount (they do not stack)"""
+    best_cost, best_discount = plan.monthly_cost * lines, None
+    for discount in discounts:
+        if lines < discount.min_lines:
+            continue
+        cost = plan.monthly_cost * lines * (1 - discount.discount_pct) + discount.monthly_cost
+        if cost < best_cost:
+            best_cost, best_discount = cost, discount
+    return best_cost, best_discount
+
+class BundleOptimizer:
+    """
+    Finds the cheapest plan + add-on bundle for a customer's usage and trips.
+
+    Plans that do not cover the customer's minutes, SMS or international
+    calling are skipped (see _covers_usage); data and roaming shortfalls are
+    covered by add-ons or priced at pay-per-use rates.
+
+    Each plan's line cost is an exact lower bound on any bundle built on it,
+    so plans are visited cheapest-first (branch-and-bound) and the search
+    stops once that bound reaches the best bundle found. Within a plan, data
+    boosters and each region's roaming packs are independent covering
+    problems solved by _min_cost_cover.
+    """
+
+    def __init__(self, plans: List[TelcoPlan] = TELCO_PLANS, addons: List[AddOn] = ADDON_CATALOG):
+        self.plans = plans
+        self.addons = {addon.addon_id: addon for addon in addons}
+
+        # Index compatible add-ons by plan and category once, up front
+        self._boosters = {}
+        self._packs = {}
+        self._discounts = {}
+        for plan in plans:
+            compatible = [a for a in addons if not a.compatible_plans or plan.plan_id in a.compatible_plans]
+            self._boosters[plan.plan_id] = [
+                (a.addon_id, a.data_gb, a.monthly_cost, a.max_quantity)
+                for a in compatible if a.category == "data_booster"
+            ]
+            packs = defaultdict(list)
+            for a in compatible:
+                if a.category == "roaming_pack" and a.region:
+                    packs[a.region].append((a.addon_id, a.roaming_days, a.monthly_cost, a.max_quantity))
+            self._packs[plan.plan_id] = dict(packs)
+            self._discounts[plan.plan_id] = [a for a in compatible if a.category == "multi_line"]
+
+    def optimize(self, customer: CustomerProfile, trips: Optional[List[Trip]] = None,
+                 _cover_cache: Optional[Dict] = None) -> Optional[PlanBundle]:
+        """Return the cheapest bundle for the customer, or None if no plan covers their usage"""
+        cover_cache = {} if _cover_cache is None else _cover_cache
+        days_by_region = _trip_days_by_region(trips or [])
+        daily_usage = _daily_usage(customer)
+
+        candidates = []
+        for plan in self.plans:
+            if not _covers_usage(customer, plan):
+                continue
+            line_cost, discount = _line_cost(plan, customer.lines, self._discounts[plan.plan_id])
+            candidates.append((line_cost, plan, discount))
+        candidates.sort(key=lambda c: c[0])
+
+        best = None
+        for line_cost, plan, discount in candidates:
+            if best is not None and line_cost >= best.total_cost:
+                break  # every remaining plan costs at least this much
+
+            # Data boosters
+            need = _data_need(customer, plan)
+            key = ("data", plan.plan_id, need)
+            if key not in cover_cache:
+                cover_cache[key] = _min_cost_cover(self._boosters[plan.plan_id], need, DATA_OVERAGE_PER_GB)
+            addon_cost, usage_cost, selection = cover_cache[key]
+            addons = dict(selection)
+            if best is not None and line_cost + addon_cost + usage_cost >= best.total_cost:
+                continue
+
+            # Roaming packs, one covering problem per region
+            for region, days in days_by_region.items():
+                penalty = daily_usage * plan.roaming_rates.get(region, DEFAULT_ROAMING_RATE)
+                key = ("roaming", plan.plan_id, region, days, penalty)
+                if key not in cover_cache:
+                    cover_cache[key] = _min_cost_cover(self._packs[plan.plan_id].get(region, []), days, penalty)
+                region_addon_cost, region_usage_cost, selection = cover_cache[key]
+                addon_cost += region_addon_cost
+                usage_cost += region_usage_cost
+                for addon_id, qty in selection.items():
+                    addons[addon_id] = addons.get(addon_id, 0) + qty
+
+            total_cost = line_cost + addon_cost + usage_cost
+            if best is None or total_cost < best.total_cost:
+                if discount is not None:
+                    addons[discount.addon_id] = 1
+                best = PlanBundle(
+                    customer_id=customer.customer_id,
+                    plan_id=plan.plan_id,
+                    addons=addons,
+                    plan_cost=line_cost,
+                    addon_cost=addon_cost,
+                    usage_cost=usage_cost,
+                    total_cost=total_cost
+                )
+
+        return best
+
+    def optimize_batch(self, customers: Iterable[CustomerProfile],
+                       trips_by_customer: Optional[Dict[str, List[Trip]]] = None) -> Dict[str, Optional[PlanBundle]]:
+        """
+        Optimize bundles for many customers, sharing covering-problem results
+        between customers with the same data need or trip profile.
+        """
+        trips_by_customer = trips_by_customer or {}
+        cover_cache = {}
+        return {
+            customer.customer_id: self.optimize(customer, trips_by_customer.get(customer.customer_id), cover_cache)
+            for customer in customers
+        }
+
+def bundle_cost(customer: CustomerProfile, plan: TelcoPlan, addons: Dict[str, int],
+                catalog: Dict[str, AddOn], trips: Optional[List[Trip]] = None) -> Optional[float]:
+    """Total monthly cost of a specific bundle, or None if the bundle is not valid"""
+    discounts = [catalog[a] for a, qty in addons.items() if qty and catalog[a].category == "multi_line"]
+    if len(discounts) > 1 or not _covers_usage(customer, plan):
+        return None
+
+    line_cost = plan.monthly_cost * customer.lines
+    total = 0.0
+    covered_gb = 0
+    covered_days = defaultdict(int)
+    for addon_id, qty in addons.items():
+        addon = catalog[addon_id]
+        if qty == 0:
+            continue
+        if qty > addon.max_quantity or (addon.compatible_plans and plan.plan_id not in addon.compatible_plans):
+            return None
+        if addon.category == "multi_line":
+            if customer.lines < addon.min_lines:
+                return None
+            line_cost = plan.monthly_cost * customer.lines * (1 - addon.discount_pct) + addon.monthly_cost
+            continue
+        total += addon.monthly_cost * qty
+        if addon.category == "data_booster":
+            covered_gb += addon.data_gb * qty
+        elif addon.category == "roaming_pack":
+            covered_days[addon.region] += addon.roaming_days * qty
+
+    total += line_cost
+    total += max(0.0, _data_need(customer, plan) - covered_gb) * DATA_OVERAGE_PER_GB
+    daily_usage = _daily_usage(customer)
+    for region, days in _trip_days_by_region(trips or []).items():
+        rate = plan.roaming_rates.get(region, DEFAULT_ROAMING_RATE)
+        total += max(0, days - covered_days[region]) * daily_usage * rate
+    return total
+
+def brute_force_bundle(customer: CustomerProfile, plans: List[TelcoPlan], addons: List[AddOn],
+                       trips: Optional[List[Trip]] = None) -> Tuple[Optional[str], Dict[str, int], float]:
+    """Reference solver: enumerate every plan and add-on quantity combination"""
+    catalog = {addon.addon_id: addon for addon in addons}
+    best = (None, {}, float('inf'))
+    for plan in plans:
+        quantity_ranges = [range(addon.max_quantity + 1) for addon in addons]
+        for quantities in itertools.product(*quantity_ranges):
+            selection = {addon.addon_id: qty for addon, qty in zip(addons, quantities) if qty}
+            cost = bundle_cost(customer, plan, selection, catalog, trips)
+            if cost is not None and cost < best[2]:
+                best = (plan.plan_id, selection, cost)
+    return best
+
+def _synthetic_catalog(num_addons: int, plans: List[TelcoPlan], rng: random.Random) -> List[AddOn]:
+    regions = ["EU", "US", "ASIA", "LATAM", "AFRICA"]
+    addons = []
+    for i in range(num_addons):
+        kind = rng.choice(["data_booster", "data_booster", "roaming_pack", "roaming_pack", "multi_line"])
+        compatible = rng.sample([p.plan_id for p in plans], rng.randint(1, len(plans))) if rng.random() < 0.3 else []
+        if kind == "data_booster":
+            gb = rng.choice([1, 2, 3, 5, 10, 20])
+            addon = AddOn(addon_id=f"sku_{i}", name=f"{gb}GB Booster", category=kind,
+                          monthly_cost=round(gb * rng.uniform(1.5, 9.0), 2), data_gb=gb,
+                          max_quantity=rng.randint(1, 3), compatible_plans=compatible)
+        elif kind == "roaming_pack":
+            days = rng.choice([1, 3, 7, 14, 30])
+            addon = AddOn(addon_id=f"sku_{i}", name=f"{days}-day Roaming Pack", category=kind,
+                          monthly_cost=round(days * rng.uniform(0.005, 0.05), 3), region=rng.choice(regions),
+                          roaming_days=days, max_quantity=rng.randint(1, 3), compatible_plans=compatible)
+        else:
+            addon = AddOn(addon_id=f"sku_{i}", name="Multi-line Discount", category=kind,
+                          monthly_cost=round(rng.uniform(0, 5), 2), min_lines=rng.randint(2, 5),
+                          discount_pct=round(rng.uniform(0.05, 0.3), 2), compatible_plans=compatible)
+        addons.append(addon)
+    return addons
+
+def _synthetic_customers(count: int, rng: random.Random) -> List[Tuple[CustomerProfile, List[Trip]]]:
+    customers = []
+    for i in range(count):
+        usage = UsagePattern(
+            monthly_data_gb=round(rng.uniform(1, 40), 1),
+            monthly_minutes=rng.randint(100, 2000),
+            monthly_sms=rng.randint(0, 1000),
+            international_usage=rng.random() < 0.5,
+            roaming_countries=[],
+            avg_monthly_bill=round(rng.uniform(20, 120), 2)
+        )
+        customer = CustomerProfile(customer_id=f"BENCH{i:04d}", name=f"Customer {i}", current_plan="basic_mobile",
+                                   usage_pattern=usage, preferences={}, lines=rng.randint(1, 5))
+        trips = [Trip(region=rng.choice(["EU", "US", "ASIA", "LATAM"]), days=rng.randint(1, 21))
+                 for _ in range(rng.randint(0, 3))]
+        customers.append((customer, trips))
+    return customers
+
+def benchmark_bundle_optimizer(seed: int = 7):
+    """Check the optimizer against brute force on small catalogs, then time it on large ones"""
+    rng = random.Random(seed)
+
+    print("Correctness vs brute force (8 add-ons, 20 customers):")
+    for trial in range(3):
+        addons = _synthetic_catalog(8, TELCO_PLANS, rng)
+        optimizer = BundleOptimizer(TELCO_PLANS, addons)
+        brute_time = opt_time = 0.0
+        mismatches = 0
+        for customer, trips in _synthetic_customers(20, rng):
+            start = time.perf_counter()
+            _, _, expected = brute_force_bundle(customer, TELCO_PLANS, addons, trips)
+            brute_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            bundle = optimizer.optimize(customer, trips)
+            opt_time += time.perf_counter() - start
+
+            if bundle is None:
+                mismatches += expected != float('inf')
+            elif abs(bundle.total_cost - expected) > 1e-6:
+                mismatches += 1
+        print(f"  trial {trial + 1}: mismatches={mismatches} brute_force={brute_time * 1000:.1f}ms optimizer={opt_time * 1000:.1f}ms")
+
+    print("\nScaling (batch of 200 customers):")
+    customers = _synthetic_customers(200, rng)
+    trips_by_customer = {customer.customer_id: trips for customer, trips in customers}
+    for num_addons in [100, 1000, 5000]:
+        addons = _synthetic_catalog(num_addons, TELCO_PLANS, rng)
+        start = time.perf_counter()
+        optimizer = BundleOptimizer(TELCO_PLANS, addons)
+        index_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        optimizer.optimize_batch([c for c, _ in customers], trips_by_customer)
+        batch_time = time.perf_counter() - start
+        print(f"  {num_addons:>5} add-ons: index={index_time * 1000:.1f}ms batch={batch_time * 1000:.1f}ms "
+              f"({batch_time / len(customers) * 1000:.2f}ms/customer)")
+
+if __name__ == "__main__":
+    optimizer = BundleOptimizer()
+    for customer in MOCK_CUSTOMERS.values():
+        bundle = optimizer.optimize(customer, [Trip(region="US", days=10), Trip(region="EU", days=5)])
+        print(bundle.model_dump_json(indent=2) if bundle else f"No plan covers {customer.customer_id}'s usage")
+    print()
+    benchmark_bundle_optimizer()
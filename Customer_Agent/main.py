@@ -1,6 +1,7 @@
 import os
 from dotenv import load_dotenv
 from agents import triage_agent
+from turn_context import turn_scope
 import json
 
 def run_demo_loop(agent, stream=False):
@@ -11,8 +12,9 @@ def run_demo_loop(agent, stream=False):
         if user_input.lower() == 'exit':
             print("Ending session. Goodbye!")
             break
-        # Simulate agent response
-        response = simulate_agent_response(user_input, agent)
+        # Simulate agent response - tool lookups are memoized for this turn only
+        with turn_scope():
+            response = simulate_agent_response(user_input, agent)
         print(f"{agent.name}: {response}")
 
 def simulate_agent_response(user_input, agent):
@@ -1,5 +1,5 @@
 # mock_data.py
-from models import TelcoPlan, CustomerProfile, UsagePattern
+from models import TelcoPlan, CustomerProfile, UsagePattern, AddOn
 
 # Mock telco plans database
 TELCO_PLANS = [
@@ -38,6 +38,70 @@ TELCO_PLANS = [
     )
 ]
 
+# Mock add-on catalog
+ADDON_CATALOG = [
+    AddOn(
+        addon_id="data_boost_5",
+        name="5GB Data Booster",
+        category="data_booster",
+        monthly_cost=15.0,
+        data_gb=5,
+        max_quantity=4
+    ),
+    AddOn(
+        addon_id="data_boost_10",
+        name="10GB Data Booster",
+        category="data_booster",
+        monthly_cost=25.0,
+        data_gb=10,
+        max_quantity=2
+    ),
+    AddOn(
+        addon_id="roam_eu_7",
+        name="EU Roaming Week Pass",
+        category="roaming_pack",
+        monthly_cost=0.25,
+        region="EU",
+        roaming_days=7,
+        max_quantity=4
+    ),
+    AddOn(
+        addon_id="roam_us_7",
+        name="US Roaming Week Pass",
+        category="roaming_pack",
+        monthly_cost=0.30,
+        region="US",
+        roaming_days=7,
+        max_quantity=4
+    ),
+    AddOn(
+        addon_id="roam_asia_7",
+        name="Asia Roaming Week Pass",
+        category="roaming_pack",
+        monthly_cost=0.40,
+        region="ASIA",
+        roaming_days=7,
+        max_quantity=4
+    ),
+    AddOn(
+        addon_id="multi_line_2",
+        name="Duo Line Discount",
+        category="multi_line",
+        monthly_cost=0.0,
+        min_lines=2,
+        discount_pct=0.10
+    ),
+    AddOn(
+        addon_id="multi_line_4",
+        name="Family Line Discount",
+        category="multi_line",
+        monthly_cost=0.0,
+        min_lines=4,
+        discount_pct=0.20,
+        compatible_plans=["premium_unlimited", "traveler_roaming"]
+    )
+]
+
 # Mock customer database
 MOCK_CUSTOMERS = {
     "CUST001": CustomerProfile(
@@ -53,6 +117,21 @@ MOCK_CUSTOMERS = {
             avg_monthly_bill=35.0
         ),
         preferences={"budget": "50", "priority": "data"}
+    ),
+    "CUST002": CustomerProfile(
+        customer_id="CUST002",
+        name="Jane Smith",
+        current_plan="premium_unlimited",
+        usage_pattern=UsagePattern(
+            monthly_data_gb=30.0,
+            monthly_minutes=400,
+            monthly_sms=300,
+            international_usage=False,
+            roaming_countries=["EU"],
+            avg_monthly_bill=240.0
+        ),
+        preferences={"budget": "200", "priority": "family"},
+        lines=4
     )
 }
 
@@ -1,8 +1,8 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional, Dict
 from enum import Enum
 
-class UsagePattern(BaseModel):
+class UsagePattern(BaseModel):  # account-wide totals across all lines
     monthly_data_gb: float
     monthly_minutes: int
     monthly_sms: int
@@ -16,6 +16,7 @@ class CustomerProfile(BaseModel):
     current_plan: str
     usage_pattern: UsagePattern
     preferences: Dict[str, str]  # budget, features, etc.
+    lines: int = 1  # number of lines on the account
 
 class TelcoPlan(BaseModel):
     plan_id: str
@@ -33,3 +34,29 @@ class PlanRecommendation(BaseModel):
     savings_potential: float
     suitability_score: float
     reasoning: str
+
+class AddOn(BaseModel):
+    addon_id: str
+    name: str
+    category: str  # data_booster, roaming_pack, multi_line
+    monthly_cost: float
+    data_gb: int = 0  # data_booster: extra GB per unit
+    region: Optional[str] = None  # roaming_pack: region covered
+    roaming_days: int = 0  # roaming_pack: days covered per unit
+    min_lines: int = 0  # multi_line: lines required for the discount
+    discount_pct: float = 0.0  # multi_line: discount on the plan cost of every line
+    max_quantity: int = 1
+    compatible_plans: List[str] = []  # empty means every plan
+
+class Trip(BaseModel):
+    region: str
+    days: int = Field(gt=0)
+
+class PlanBundle(BaseModel):
+    customer_id: str
+    plan_id: str
+    addons: Dict[str, int]  # addon_id -> quantity
+    plan_cost: float
+    addon_cost: float
+    usage_cost: float  # data overage and pay-per-use roaming
+    total_cost: float
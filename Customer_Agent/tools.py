@@ -1,16 +1,64 @@
 from langchain.agents import Tool
 from langchain.tools import BaseTool
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 import json
+import os
+from dotenv import load_dotenv
 
 # Import our models and data
-from models import CustomerProfile, TelcoPlan, PlanRecommendation
+from models import CustomerProfile, TelcoPlan, PlanRecommendation, Trip
 from mock_data import MOCK_CUSTOMERS, TELCO_PLANS, TELCO_KNOWLEDGE_BASE
 from rag_pipeline import TelcoRAGPipeline
+from rag_sharded import ShardedTelcoRAGPipeline
+from turn_context import memoize
+from bundle_optimizer import BundleOptimizer, DATA_OVERAGE_PER_GB, DEFAULT_ROAMING_RATE, ROAMING_REGIONS
 
-# Initialize RAG pipeline
-rag_pipeline = TelcoRAGPipeline(TELCO_KNOWLEDGE_BASE)
+# The pipeline is configured from the environment at import time, before main.py gets to load .env
+load_dotenv()
+
+# Initialize RAG pipeline - RAG_NUM_SHARDS > 1 partitions the corpus under RAG_SHARD_PATH across
+# worker processes, otherwise VECTOR_DB_PATH holds a memory-mapped store shared by every worker on the host
+num_shards = int(os.getenv("RAG_NUM_SHARDS", "1"))
+vector_db_path = os.getenv("VECTOR_DB_PATH")
+if num_shards > 1:
+    shard_path = os.getenv("RAG_SHARD_PATH", "rag_shards")
+    rag_pipeline = ShardedTelcoRAGPipeline.load_or_build(shard_path, TELCO_KNOWLEDGE_BASE, num_shards)
+elif vector_db_path:
+    rag_pipeline = TelcoRAGPipeline.load_or_build(vector_db_path, TELCO_KNOWLEDGE_BASE)
+else:
+    rag_pipeline = TelcoRAGPipeline(TELCO_KNOWLEDGE_BASE)
+
+# Plan + add-on bundle optimizer over the full catalog
+bundle_optimizer = BundleOptimizer()
+
+# Memoized lookups - each entity is loaded once per turn (see turn_context.py)
+def _get_customer(customer_id: str) -> Optional[CustomerProfile]:
+    return memoize("customer", customer_id, lambda: MOCK_CUSTOMERS.get(customer_id))
+
+def _get_customer_profile_dict(customer_id: str) -> Optional[Dict[str, Any]]:
+    def load():
+        customer = _get_customer(customer_id)
+        return customer.model_dump() if customer else None
+    return memoize("customer_profile", customer_id, load)
+
+def _get_plan(plan_id: str) -> Optional[TelcoPlan]:
+    return memoize("plan", plan_id, lambda: next((p for p in TELCO_PLANS if p.plan_id == plan_id), None))
+
+def _get_plan_dict(plan_id: str) -> Optional[Dict[str, Any]]:
+    def load():
+        plan = _get_plan(plan_id)
+        return plan.model_dump() if plan else None
+    return memoize("plan_dict", plan_id, load)
+
+def _retrieve(query: str, top_k: int) -> Tuple[List[Dict], List[int]]:
+    """Retrieved documents plus the ids of any shards missing from them"""
+    def load():
+        if isinstance(rag_pipeline, ShardedTelcoRAGPipeline):
+            results, failed_shards = rag_pipeline.retrieve_batch_with_status([query], top_k)
+            return results[0], failed_shards
+        return rag_pipeline.retrieve(query, top_k=top_k), []
+    return memoize("retrieval", (query, top_k), load)
 
 # Tool function implementations
 def get_customer_profile_func(customer_id: str) -> str:
@@ -24,14 +72,82 @@ def get_customer_profile_func(customer_id: str) -> str:
         JSON string of customer profile with usage history and preferences
     """
     try:
-        customer = MOCK_CUSTOMERS.get(customer_id)
-        if not customer:
+        profile = _get_customer_profile_dict(customer_id)
+        if profile is None:
             return json.dumps({"error": f"Customer {customer_id} not found"})
         
-        return json.dumps(customer.model_dump(), indent=2)
+        return json.dumps(profile, indent=2)
     except Exception as e:
         return json.dumps({"error": f"Error retrieving customer profile: {str(e)}"})
 
+def _analyze_plan_suitability(customer_id: str, plan_id: str) -> Optional[Dict[str, Any]]:
+    """Score a plan against a customer's usage, memoized per (customer, plan) for the turn"""
+    return memoize("plan_analysis", (customer_id, plan_id), lambda: _compute_plan_suitability(customer_id, plan_id))
+
+def _compute_plan_suitability(customer_id: str, plan_id: str) -> Optional[Dict[str, Any]]:
+    customer = _get_customer(customer_id)
+    plan = _get_plan(plan_id)
+    
+    if not customer or not plan:
+        return None
+    
+    usage = customer.usage_pattern
+    
+    # Calculate suitability score (0-100)
+    score = 0
+    reasoning_points = []
+    
+    # Data usage analysis
+    if plan.data_allowance_gb == float('inf'):
+        if usage.monthly_data_gb > 20:
+            score += 30
+            reasoning_points.append("Unlimited data perfect for heavy usage")
+        else:
+            score += 15
+            reasoning_points.append("Unlimited data provides peace of mind")
+    elif usage.monthly_data_gb <= plan.data_allowance_gb:
+        score += 25
+        reasoning_points.append(f"Data allowance ({plan.data_allowance_gb}GB) covers usage ({usage.monthly_data_gb}GB)")
+    else:
+        score -= 20
+        reasoning_points.append(f"Insufficient data: {plan.data_allowance_gb}GB < {usage.monthly_data_gb}GB needed")
+    
+    # International usage
+    if usage.international_usage and plan.international_included:
+        score += 25
+        reasoning_points.append("International calling included")
+    elif usage.international_usage and not plan.international_included:
+        score -= 15
+        reasoning_points.append("No international calling - additional charges apply")
+    
+    # Budget analysis
+    budget = float(customer.preferences.get("budget", "100"))
+    if plan.monthly_cost <= budget:
+        score += 20
+        reasoning_points.append(f"Within budget: ${plan.monthly_cost} <= ${budget}")
+    else:
+        score -= 10
+        reasoning_points.append(f"Over budget: ${plan.monthly_cost} > ${budget}")
+    
+    # Roaming analysis
+    if usage.roaming_countries:
+        avg_roaming_rate = sum(plan.roaming_rates.get(country, DEFAULT_ROAMING_RATE) for country in usage.roaming_countries) / len(usage.roaming_countries)
+        if avg_roaming_rate < 0.05:
+            score += 10
+            reasoning_points.append("Excellent roaming rates")
+        elif avg_roaming_rate < 0.10:
+            score += 5
+            reasoning_points.append("Good roaming rates")
+    
+    result = {
+        "suitability_score": max(0, min(100, score)),
+        "reasoning": "; ".join(reasoning_points),
+        "monthly_cost": plan.monthly_cost,
+        "potential_overage_cost": max(0, (usage.monthly_data_gb - plan.data_allowance_gb) * DATA_OVERAGE_PER_GB) if plan.data_allowance_gb != float('inf') else 0
+    }
+    
+    return result
+
 def analyze_plan_suitability_func(input_str: str) -> str:
     """
     Analyze how well a specific plan fits a customer's usage pattern.
@@ -48,67 +164,10 @@ def analyze_plan_suitability_func(input_str: str) -> str:
         customer_id = input_data.get("customer_id")
         plan_id = input_data.get("plan_id")
         
-        customer = MOCK_CUSTOMERS.get(customer_id)
-        plan = next((p for p in TELCO_PLANS if p.plan_id == plan_id), None)
-        
-        if not customer or not plan:
+        result = _analyze_plan_suitability(customer_id, plan_id)
+        if result is None:
             return json.dumps({"error": "Customer or plan not found"})
         
-        usage = customer.usage_pattern
-        
-        # Calculate suitability score (0-100)
-        score = 0
-        reasoning_points = []
-        
-        # Data usage analysis
-        if plan.data_allowance_gb == float('inf'):
-            if usage.monthly_data_gb > 20:
-                score += 30
-                reasoning_points.append("Unlimited data perfect for heavy usage")
-            else:
-                score += 15
-                reasoning_points.append("Unlimited data provides peace of mind")
-        elif usage.monthly_data_gb <= plan.data_allowance_gb:
-            score += 25
-            reasoning_points.append(f"Data allowance ({plan.data_allowance_gb}GB) covers usage ({usage.monthly_data_gb}GB)")
-        else:
-            score -= 20
-            reasoning_points.append(f"Insufficient data: {plan.data_allowance_gb}GB < {usage.monthly_data_gb}GB needed")
-        
-        # International usage
-        if usage.international_usage and plan.international_included:
-            score += 25
-            reasoning_points.append("International calling included")
-        elif usage.international_usage and not plan.international_included:
-            score -= 15
-            reasoning_points.append("No international calling - additional charges apply")
-        
-        # Budget analysis
-        budget = float(customer.preferences.get("budget", "100"))
-        if plan.monthly_cost <= budget:
-            score += 20
-            reasoning_points.append(f"Within budget: ${plan.monthly_cost} <= ${budget}")
-        else:
-            score -= 10
-            reasoning_points.append(f"Over budget: ${plan.monthly_cost} > ${budget}")
-        
-        # Roaming analysis
-        if usage.roaming_countries:
-            avg_roaming_rate = sum(plan.roaming_rates.get(country, 0.20) for country in usage.roaming_countries) / len(usage.roaming_countries)
-            if avg_roaming_rate < 0.05:
-                score += 10
-                reasoning_points.append("Excellent roaming rates")
-            elif avg_roaming_rate < 0.10:
-                score += 5
-                reasoning_points.append("Good roaming rates")
-        
-        result = {
-            "suitability_score": max(0, min(100, score)),
-            "reasoning": "; ".join(reasoning_points),
-            "monthly_cost": plan.monthly_cost,
-            "potential_overage_cost": max(0, (usage.monthly_data_gb - plan.data_allowance_gb) * 10) if plan.data_allowance_gb != float('inf') else 0
-        }
-        
         return json.dumps(result, indent=2)
         
     except Exception as e:
@@ -129,20 +188,18 @@ def recommend_best_plans_func(input_str: str) -> str:
         customer_id = input_data.get("customer_id")
         max_recommendations = input_data.get("max_recommendations", 3)
         
-        customer = MOCK_CUSTOMERS.get(customer_id)
+        customer = _get_customer(customer_id)
         if not customer:
             return json.dumps({"error": f"Customer {customer_id} not found"})
         
         recommendations = []
         
         for plan in TELCO_PLANS:
-            analysis_input = json.dumps({"customer_id": customer_id, "plan_id": plan.plan_id})
-            analysis_result = analyze_plan_suitability_func(analysis_input)
-            analysis = json.loads(analysis_result)
+            analysis = _analyze_plan_suitability(customer_id, plan.plan_id)
             
-            if "error" not in analysis:
+            if analysis is not None:
                 recommendations.append({
-                    "plan": plan.model_dump(),
+                    "plan": _get_plan_dict(plan.plan_id),
                     "analysis": analysis
                 })
         
@@ -171,15 +228,17 @@ def search_telco_knowledge_func(query: str) -> str:
         JSON string with relevant information from knowledge base with sources
     """
     try:
-        context = rag_pipeline.get_context(query, top_k=3)
-        retrieved_docs = rag_pipeline.retrieve(query, top_k=3)
+        retrieved_docs, failed_shards = _retrieve(query, 3)
+        context = rag_pipeline.format_context(retrieved_docs)
         
         result = {
             "query": query,
             "context": context,
             "sources": [doc["metadata"] for doc in retrieved_docs],
             "rag_used": True,  # Indicator for response logs
-            "num_sources": len(retrieved_docs)
+            "num_sources": len(retrieved_docs),
+            "partial_results": bool(failed_shards),  # some knowledge base shards did not answer
+            "failed_shards": failed_shards
         }
         
         return json.dumps(result, indent=2)
@@ -203,11 +262,11 @@ def calculate_roaming_costs_func(input_str: str) -> str:
         destination_countries = input_data.get("destination_countries", [])
         days = input_data.get("days", 1)
         
-        customer = MOCK_CUSTOMERS.get(customer_id)
+        customer = _get_customer(customer_id)
         if not customer:
             return json.dumps({"error": f"Customer {customer_id} not found"})
         
-        current_plan = next((p for p in TELCO_PLANS if p.plan_id == customer.current_plan), None)
+        current_plan = _get_plan(customer.current_plan)
         if not current_plan:
             return json.dumps({"error": "Current plan not found"})
         
@@ -217,7 +276,7 @@ def calculate_roaming_costs_func(input_str: str) -> str:
         total_cost = 0
         
         for country in destination_countries:
-            rate = current_plan.roaming_rates.get(country, 0.20)  # Default rate
+            rate = current_plan.roaming_rates.get(country, DEFAULT_ROAMING_RATE)  # Default rate
             country_cost = daily_usage * rate * days
             roaming_costs[country] = {
                 "daily_rate_per_gb": rate,
@@ -227,7 +286,7 @@ def calculate_roaming_costs_func(input_str: str) -> str:
             total_cost += country_cost
         
         # Check if traveler plan would be better
-        traveler_plan = next((p for p in TELCO_PLANS if p.plan_id == "traveler_roaming"), None)
+        traveler_plan = _get_plan("traveler_roaming")
         recommendation = None
         
         if traveler_plan and total_cost > (traveler_plan.monthly_cost - current_plan.monthly_cost):
@@ -247,6 +306,41 @@ def calculate_roaming_costs_func(input_str: str) -> str:
     except Exception as e:
         return json.dumps({"error": f"Error calculating roaming costs: {str(e)}"})
 
+def optimize_plan_bundle_func(input_str: str) -> str:
+    """
+    Find the cheapest plan plus add-on bundle covering a customer's usage and planned trips.
+    
+    Args:
+        input_str: JSON string containing customer_id and optionally trips (list of region/days), or just the customer_id
+        
+    Returns:
+        JSON string with the chosen plan, add-on quantities and cost breakdown
+    """
+    try:
+        input_data = json.loads(input_str) if input_str.strip().startswith('{') else {"customer_id": input_str.strip()}
+        customer_id = input_data.get("customer_id")
+        trips = [Trip(**trip) for trip in input_data.get("trips", [])]
+        unknown_regions = sorted({trip.region for trip in trips} - set(ROAMING_REGIONS))
+        if unknown_regions:
+            return json.dumps({"error": f"Unknown trip regions {unknown_regions}; use one of {ROAMING_REGIONS}"})
+        
+        customer = _get_customer(customer_id)
+        if not customer:
+            return json.dumps({"error": f"Customer {customer_id} not found"})
+        
+        trips_key = tuple((trip.region, trip.days) for trip in trips)
+        bundle = memoize("bundle", (customer_id, trips_key), lambda: bundle_optimizer.optimize(customer, trips))
+        if bundle is None:
+            return json.dumps({"error": "No plan covers the customer's minutes, SMS and international calling"})
+        
+        result = bundle.model_dump()
+        result["current_plan"] = customer.current_plan
+        
+        return json.dumps(result, indent=2)
+        
+    except Exception as e:
+        return json.dumps({"error": f"Error optimizing plan bundle: {str(e)}"})
+
 # Create LangChain Tool objects
 get_customer_profile_tool = Tool(
     name="get_customer_profile",
@@ -278,13 +372,20 @@ calculate_roaming_costs_tool = Tool(
     func=calculate_roaming_costs_func
 )
 
+optimize_plan_bundle_tool = Tool(
+    name="optimize_plan_bundle",
+    description=f"Find the cheapest plan plus add-on bundle (data boosters, roaming packs, multi-line discounts) for a customer. Only plans that already cover the customer's minutes, SMS and international calling are considered. Input should be a JSON string with 'customer_id' and optionally 'trips' (list of objects with 'region' and 'days') fields, or just the customer_id as a string. Trip 'region' must be one of {', '.join(ROAMING_REGIONS)}; map countries to their region first (e.g. France -> EU).",
+    func=optimize_plan_bundle_func
+)
+
 # List of all tools for easy import
 TELCO_TOOLS = [
     get_customer_profile_tool,
     analyze_plan_suitability_tool,
     recommend_best_plans_tool,
     search_telco_knowledge_tool,
-    calculate_roaming_costs_tool
+    calculate_roaming_costs_tool,
+    optimize_plan_bundle_tool
 ]
 
 # Tool usage examples and testing functions
@@ -316,6 +417,11 @@ def test_tools():
     print("\n5. Testing calculate_roaming_costs:")
     result = calculate_roaming_costs_tool.run('{"customer_id": "CUST001", "destination_countries": ["US", "UK"], "days": 7}')
     print(result)
+    
+    # Test bundle optimizer
+    print("\n6. Testing optimize_plan_bundle:")
+    result = optimize_plan_bundle_tool.run('{"customer_id": "CUST001", "trips": [{"region": "US", "days": 10}]}')
+    print(result)
 
 # Alternative: Custom BaseTool implementations for more control
 class CustomerProfileTool(BaseTool):
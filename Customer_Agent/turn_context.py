@@ -0,0 +1,68 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional, Tuple
+
+class TurnContext:
+    """
+    Memoizes customer profiles, plan analyses and retrieval results for one
+    conversation turn so that every tool invoked during the turn hits the
+    backing store at most once per entity.
+    """
+
+    def __init__(self):
+        self._cache: Dict[Tuple[str, Hashable], Any] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def memoize(self, kind: str, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Return the cached value for (kind, key), calling loader on first use"""
+        cache_key = (kind, key)
+        if cache_key in self._cache:
+            self.hits += 1
+            return self._cache[cache_key]
+
+        self.misses += 1
+        value = loader()
+        self._cache[cache_key] = value
+        return value
+
+    def clear(self):
+        """Drop every memoized value"""
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._cache), "hits": self.hits, "misses": self.misses}
+
+_current_turn: ContextVar[Optional[TurnContext]] = ContextVar("telco_turn_context", default=None)
+
+def current_turn() -> Optional[TurnContext]:
+    """Return the active turn context, or None outside of a turn"""
+    return _current_turn.get()
+
+@contextmanager
+def turn_scope() -> Iterator[TurnContext]:
+    """
+    Open a turn context for the duration of the with-block.
+
+    The cache is invalidated when the block exits, so nothing is shared
+    between turns. Nested scopes reuse the outer turn's context.
+    """
+    active = _current_turn.get()
+    if active is not None:
+        yield active
+        return
+
+    turn = TurnContext()
+    token = _current_turn.set(turn)
+    try:
+        yield turn
+    finally:
+        turn.clear()
+        _current_turn.reset(token)
+
+def memoize(kind: str, key: Hashable, loader: Callable[[], Any]) -> Any:
+    """Memoize through the active turn, or call loader directly when no turn is open"""
+    turn = _current_turn.get()
+    if turn is None:
+        return loader()
+    return turn.memoize(kind, key, loader)
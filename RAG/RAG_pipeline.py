@@ -2,12 +2,15 @@ import os
 from sentence_transformers import SentenceTransformer
 import faiss
 import numpy as np
-from typing import List, Dict
+from typing import List, Dict, Optional
 import json
 
+from rag_store import knowledge_base_fingerprint, open_store, read_fingerprint, store_lock, write_store
+
 class TelcoRAGPipeline:
     def __init__(self, knowledge_base: List[Dict], model_name: str = "all-MiniLM-L6-v2"):
         self.model = SentenceTransformer(model_name)
+        self.model_name = model_name
         self.knowledge_base = knowledge_base
         self.documents = [doc["content"] for doc in knowledge_base]
         self.metadata = [{"title": doc["title"], "category": doc["category"]} for doc in knowledge_base]
@@ -27,6 +30,54 @@ class TelcoRAGPipeline:
         
         return index
     
+    def save(self, path: str):
+        """Write index, documents and metadata as a memory-mappable store (see rag_store)"""
+        write_store(path, self.index, self.documents, self.metadata, self.model_name)
+    
+    @classmethod
+    def load(cls, path: str, fingerprint: Optional[str] = None) -> "TelcoRAGPipeline":
+        """
+        Open a store written by save(), optionally requiring its fingerprint.
+        
+        The index vectors, documents and metadata are memory-mapped rather than
+        copied, so every process on the host shares one set of physical pages.
+        """
+        with store_lock(path, shared=True):
+            index, documents, metadata, manifest = open_store(path)
+        if fingerprint is not None and manifest.get("fingerprint") != fingerprint:
+            raise ValueError(f"Store at {path} was built from a different knowledge base or model")
+        
+        pipeline = cls.__new__(cls)
+        pipeline.model = SentenceTransformer(manifest["model_name"])  # outside the lock
+        pipeline.model_name = manifest["model_name"]
+        pipeline.knowledge_base = None  # not held in memory; read through documents/metadata
+        pipeline.documents = documents
+        pipeline.metadata = metadata
+        pipeline.index = index
+        return pipeline
+    
+    @classmethod
+    def load_or_build(cls, path: str, knowledge_base: List[Dict],
+                      model_name: str = "all-MiniLM-L6-v2") -> "TelcoRAGPipeline":
+        """
+        Load the store at path, first (re)building it if it is missing or was
+        built from a different knowledge base or model.
+        
+        The up-to-date check takes the store lock shared, so workers starting
+        together do not queue behind each other. Only a rebuild takes it
+        exclusive: one worker encodes the corpus while the rest wait, then all
+        load() it.
+        """
+        fingerprint = knowledge_base_fingerprint(knowledge_base, model_name)
+        
+        with store_lock(path, shared=True):
+            up_to_date = read_fingerprint(path) == fingerprint
+        if not up_to_date:
+            with store_lock(path):
+                if read_fingerprint(path) != fingerprint:  # another worker may have rebuilt it meanwhile
+                    cls(knowledge_base, model_name).save(path)
+        return cls.load(path, fingerprint)
+    
     def retrieve(self, query: str, top_k: int = 3) -> List[Dict]:
         """Retrieve relevant documents for query"""
         query_embedding = self.model.encode([query])
@@ -49,7 +100,10 @@ class TelcoRAGPipeline:
     def get_context(self, query: str, top_k: int = 3) -> str:
         """Get formatted context for LLM"""
         retrieved_docs = self.retrieve(query, top_k)
-        
+        return self.format_context(retrieved_docs)
+    
+    def format_context(self, retrieved_docs: List[Dict]) -> str:
+        """Format already-retrieved documents as LLM context"""
         if not retrieved_docs:
             return "No relevant information found in knowledge base."
         
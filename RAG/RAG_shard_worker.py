@@ -0,0 +1,67 @@
+"""
+Entry point for one ShardedTelcoRAGPipeline worker process.
+
+Started as a plain script (not through multiprocessing), so the worker never
+re-imports the parent's __main__ - and with it tools.py and the agents. It
+opens only its own shard, a store prebuilt by write_shards, so (re)starting a
+worker never re-encodes documents and every process serving the shard shares
+its pages through the OS page cache.
+
+Usage: python RAG_shard_worker.py <socket fd> <shard dir> <shard id>
+"""
+import os
+import sys
+from multiprocessing.connection import Connection
+
+import numpy as np
+
+from rag_store import open_store
+
+def shard_store_path(shard_dir: str, shard_id: int) -> str:
+    return os.path.join(shard_dir, f"shard_{shard_id}")
+
+def shard_ids_path(shard_dir: str, shard_id: int) -> str:
+    """Global doc ids of a shard's documents, in store order"""
+    return os.path.join(shard_dir, f"shard_{shard_id}.ids.npy")
+
+def serve(conn: Connection, shard_dir: str, shard_id: int):
+    """
+    Open the shard's store, then answer ("search", request_id,
+    (query_embeddings, top_k)) and ("ping", request_id, None) messages until
+    "close" arrives or the parent goes away.
+    """
+    index, documents, metadata, _ = open_store(shard_store_path(shard_dir, shard_id))
+    doc_ids = np.load(shard_ids_path(shard_dir, shard_id), mmap_mode='r')
+
+    conn.send(("ready", None, len(documents)))
+
+    while True:
+        try:
+            kind, request_id, payload = conn.recv()
+        except (EOFError, OSError):
+            break
+
+        if kind == "close":
+            break
+        if kind == "ping":
+            conn.send(("pong", request_id, len(documents)))
+        elif kind == "search":
+            query_embeddings, top_k = payload
+            if index.ntotal == 0:
+                conn.send(("results", request_id, [[] for _ in range(len(query_embeddings))]))
+                continue
+
+            scores, indices = index.search(query_embeddings, min(top_k, index.ntotal))
+            results = []
+            for row_scores, row_indices in zip(scores, indices):
+                results.append([
+                    (float(score), int(doc_ids[idx]), documents[idx], metadata[idx])
+                    for score, idx in zip(row_scores, row_indices) if idx != -1
+                ])
+            conn.send(("results", request_id, results))
+
+    conn.close()
+
+if __name__ == "__main__":
+    fd, shard_dir, shard_id = sys.argv[1:]
+    serve(Connection(int(fd)), shard_dir, int(shard_id))
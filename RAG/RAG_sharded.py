@@ -0,0 +1,491 @@
+import heapq
+import itertools
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing.connection import Connection, wait
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sentence_transformers import SentenceTransformer
+import faiss
+import numpy as np
+
+from rag_shard_worker import shard_ids_path, shard_store_path
+from rag_store import (knowledge_base_fingerprint, replace_directory, store_fingerprint, store_lock,
+                       write_store)
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.realpath(__file__)), "RAG_shard_worker.py")
+
+def _read_manifest(path: str) -> Optional[Dict]:
+    try:
+        with open(os.path.join(path, "manifest.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def shards_exist(path: str, num_shards: int, fingerprint: str) -> bool:
+    """Whether path holds a partition written by write_shards with num_shards shards of the fingerprinted corpus"""
+    manifest = _read_manifest(path)
+    return (manifest is not None and manifest.get("num_shards") == num_shards
+            and manifest.get("fingerprint") == fingerprint)
+
+def write_shards(knowledge_base: Iterable[Dict], path: str, num_shards: int,
+                 model_name: str = "all-MiniLM-L6-v2") -> str:
+    """
+    Partition documents round-robin into num_shards and write each shard as a
+    memory-mappable store (see write_store), so workers open their shard
+    instead of encoding it.
+
+    Documents are streamed once: knowledge_base can be a generator over a
+    corpus that does not fit in memory, and only one shard is encoded at a
+    time. Doc ids are positions in knowledge_base. The partition is assembled
+    in a temporary sibling directory and renamed into place, replacing any
+    existing partition. Hold store_lock while writing if other processes may
+    write or load the same path.
+
+    Returns:
+        The corpus fingerprint recorded in the manifest
+    """
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    tmp_path = tempfile.mkdtemp(prefix=".shards-", dir=parent)
+    try:
+        spool_paths = [os.path.join(tmp_path, f"shard_{shard_id}.jsonl") for shard_id in range(num_shards)]
+        counts = [0] * num_shards
+        files = [open(spool_path, "w", encoding="utf-8") for spool_path in spool_paths]
+        try:
+            def records():
+                for doc_id, doc in enumerate(knowledge_base):
+                    shard_id = doc_id % num_shards
+                    meta = {"title": doc["title"], "category": doc["category"]}
+                    files[shard_id].write(json.dumps([doc_id, doc["content"], meta]) + "\n")
+                    counts[shard_id] += 1
+                    yield doc["content"], meta
+
+            fingerprint = store_fingerprint(records(), model_name)
+        finally:
+            for f in files:
+                f.close()
+
+        model = SentenceTransformer(model_name)
+        dimension = model.encode(["dimension probe"]).shape[1]
+        for shard_id, spool_path in enumerate(spool_paths):
+            with open(spool_path, encoding="utf-8") as f:
+                rows = [json.loads(line) for line in f]
+            doc_ids = np.array([row[0] for row in rows], dtype=np.int64)
+            documents = [row[1] for row in rows]
+            metadata = [row[2] for row in rows]
+            del rows
+
+            index = faiss.IndexFlatIP(dimension)
+            if documents:
+                embeddings = model.encode(documents)
+                faiss.normalize_L2(embeddings)
+                index.add(embeddings.astype('float32'))
+            write_store(shard_store_path(tmp_path, shard_id), index, documents, metadata, model_name)
+            np.save(shard_ids_path(tmp_path, shard_id), doc_ids)
+            os.remove(spool_path)
+
+        with open(os.path.join(tmp_path, "manifest.json"), "w") as f:
+            json.dump({
+                "num_shards": num_shards,
+                "counts": counts,
+                "model_name": model_name,
+                "fingerprint": fingerprint
+            }, f, indent=2)
+
+        replace_directory(tmp_path, path)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+    return fingerprint
+
+class _Shard:
+    def __init__(self, shard_id: int, doc_count: int):
+        self.shard_id = shard_id
+        self.doc_count = doc_count
+        self.process = None
+        self.conn = None
+        self.state = "stopped"  # stopped -> starting -> ready, or failed
+        self.start_deadline = 0.0
+        self.busy_request = None  # request id of a search that missed its deadline
+        self.busy_deadline = 0.0  # past this, a busy worker is treated as hung
+        self.failures = 0
+        self.consecutive_failures = 0  # reset once the worker comes up; drives restart backoff
+        self.retry_at = 0.0
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+class ShardedTelcoRAGPipeline:
+    """
+    RAG pipeline whose corpus is partitioned across worker processes.
+
+    Each worker memory-maps one shard store written by write_shards; this
+    process keeps only per-shard document counts. Queries are encoded once
+    here, fanned out to every shard in parallel and the per-shard top-k lists
+    are merged into a global top-k.
+
+    Workers run RAG_shard_worker.py as a plain subprocess, so they never
+    re-import the application, and start lazily on first use (or start()).
+    A worker that dies, does not come up within start_timeout, or stays busy
+    past busy_timeout is restarted on a later query, backing off
+    exponentially while it keeps failing. A live worker that is merely slow
+    is left running; it is skipped until its late reply has been drained.
+    Shards missing from a query are reported by retrieve_batch_with_status.
+    """
+
+    def __init__(self, shard_path: str, model_name: Optional[str] = None, shard_timeout: float = 10.0,
+                 query_timeout: float = 0.05, start_timeout: float = 60.0, busy_timeout: Optional[float] = None,
+                 backoff_base: float = 1.0, backoff_max: float = 60.0):
+        with open(os.path.join(shard_path, "manifest.json")) as f:
+            manifest = json.load(f)
+        if model_name is not None and model_name != manifest["model_name"]:
+            raise ValueError(f"Shards at {shard_path} were encoded with {manifest['model_name']}, not {model_name}")
+
+        self.model_name = manifest["model_name"]
+        self.model = SentenceTransformer(self.model_name)
+        self.shard_path = shard_path
+        self.num_shards = manifest["num_shards"]
+        self.shard_timeout = shard_timeout  # base deadline per fan-out
+        self.query_timeout = query_timeout  # extra deadline per query in a batch
+        self.start_timeout = start_timeout  # deadline for a worker to open its store
+        self.busy_timeout = busy_timeout if busy_timeout is not None else 3 * shard_timeout
+        self.backoff_base = backoff_base  # first restart delay; doubles per consecutive failure
+        self.backoff_max = backoff_max
+        self.failed_shards: List[int] = []  # shards missing from the last query
+
+        self.shards = [_Shard(shard_id, count) for shard_id, count in enumerate(manifest["counts"])]
+        self._request_ids = itertools.count()
+        self._lock = threading.RLock()  # pipes are shared; one fan-out at a time
+        self._started = False
+
+    @classmethod
+    def load_or_build(cls, path: str, knowledge_base: Iterable[Dict], num_shards: int,
+                      model_name: str = "all-MiniLM-L6-v2", **kwargs) -> "ShardedTelcoRAGPipeline":
+        """
+        Open the partition at path, first (re)writing it if it is missing, has
+        a different shard count, or was built from a different knowledge base
+        or model. Locks the same way as TelcoRAGPipeline.load_or_build.
+        """
+        fingerprint = knowledge_base_fingerprint(knowledge_base, model_name)
+
+        with store_lock(path, shared=True):
+            up_to_date = shards_exist(path, num_shards, fingerprint)
+        if not up_to_date:
+            with store_lock(path):
+                if not shards_exist(path, num_shards, fingerprint):  # another worker may have rebuilt it meanwhile
+                    write_shards(knowledge_base, path, num_shards, model_name)
+        return cls(path, model_name, **kwargs)
+
+    def _launch(self, shard: _Shard):
+        parent_sock, child_sock = socket.socketpair()
+        shard.process = subprocess.Popen(
+            [sys.executable, WORKER_SCRIPT, str(child_sock.fileno()), self.shard_path, str(shard.shard_id)],
+            pass_fds=(child_sock.fileno(),)
+        )
+        child_sock.close()
+        shard.conn = Connection(parent_sock.detach())
+        shard.state = "starting"
+        shard.start_deadline = time.monotonic() + self.start_timeout
+        shard.busy_request = None
+
+    def _fail(self, shard: _Shard):
+        """Tear down a shard so it is restarted once its backoff expires"""
+        if shard.is_alive():
+            shard.process.terminate()
+            try:
+                shard.process.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                shard.process.kill()
+        if shard.conn is not None:
+            shard.conn.close()
+        shard.process, shard.conn = None, None
+        shard.state = "failed"
+        shard.busy_request = None
+        shard.failures += 1
+        shard.consecutive_failures += 1
+        delay = min(self.backoff_base * 2 ** (shard.consecutive_failures - 1), self.backoff_max)
+        shard.retry_at = time.monotonic() + delay
+
+    def _check_ready(self, shard: _Shard, timeout: float = 0.0) -> bool:
+        """Consume a starting shard's ready message, failing it if it died or ran past its start deadline"""
+        if shard.state != "starting":
+            return shard.state == "ready"
+        try:
+            if shard.conn.poll(timeout):
+                kind, _, _ = shard.conn.recv()
+                if kind == "ready":
+                    shard.state = "ready"
+                    shard.consecutive_failures = 0
+            elif not shard.is_alive() or time.monotonic() >= shard.start_deadline:
+                self._fail(shard)
+        except (EOFError, OSError):
+            self._fail(shard)
+        return shard.state == "ready"
+
+    def _drain(self, shard: _Shard):
+        """Discard late replies from a slow shard; it is usable again once its pending reply is in"""
+        try:
+            while shard.busy_request is not None and shard.conn.poll(0):
+                _, reply_id, _ = shard.conn.recv()
+                if reply_id == shard.busy_request:
+                    shard.busy_request = None
+        except (EOFError, OSError):
+            self._fail(shard)
+
+    def _mark_busy(self, shard: _Shard, request_id: int):
+        if shard.busy_request is None:
+            shard.busy_deadline = time.monotonic() + self.busy_timeout
+        shard.busy_request = request_id
+
+    def _refresh(self, shard: _Shard):
+        """
+        Bring a shard up to date before a fan-out: collect ready and late
+        messages, fail dead or hung workers and restart failed ones whose
+        backoff has expired
+        """
+        if shard.state == "ready" and not shard.is_alive():
+            self._fail(shard)
+        if shard.state == "failed" and time.monotonic() >= shard.retry_at:
+            self._launch(shard)
+        self._check_ready(shard)
+        if shard.state == "ready":
+            self._drain(shard)
+        if shard.state == "ready" and shard.busy_request is not None and time.monotonic() >= shard.busy_deadline:
+            self._fail(shard)
+
+    def start(self):
+        """Launch every shard and wait for them to open their stores (in parallel)"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            for shard in self.shards:
+                self._launch(shard)
+
+            deadline = time.monotonic() + self.start_timeout
+            for shard in self.shards:
+                # _check_ready already failed shards that died; only fail those still starting
+                if not self._check_ready(shard, max(0.0, deadline - time.monotonic())) and shard.state == "starting":
+                    self._fail(shard)
+
+    def close(self):
+        """Stop all shard workers"""
+        with self._lock:
+            for shard in self.shards:
+                if shard.conn is not None:
+                    try:
+                        shard.conn.send(("close", None, None))
+                    except (BrokenPipeError, OSError):
+                        pass
+                if shard.process is not None:
+                    try:
+                        shard.process.wait(timeout=1)
+                    except subprocess.TimeoutExpired:
+                        shard.process.kill()
+                        shard.process.wait()
+                if shard.conn is not None:
+                    shard.conn.close()
+                shard.process, shard.conn = None, None
+                shard.state = "stopped"
+                shard.busy_request = None
+            self._started = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def health(self) -> List[Dict]:
+        """Ping every shard and report its state"""
+        self.start()
+        with self._lock:
+            report = []
+            for shard in self.shards:
+                self._refresh(shard)
+                if shard.state == "ready" and shard.busy_request is None:
+                    try:
+                        request_id = next(self._request_ids)
+                        shard.conn.send(("ping", request_id, None))
+                        if shard.conn.poll(self.shard_timeout):
+                            shard.conn.recv()
+                        else:
+                            self._mark_busy(shard, request_id)
+                    except (EOFError, BrokenPipeError, OSError):
+                        self._fail(shard)
+                report.append({
+                    "shard": shard.shard_id,
+                    "state": "busy" if shard.state == "ready" and shard.busy_request is not None else shard.state,
+                    "documents": shard.doc_count,
+                    "failures": shard.failures
+                })
+            return report
+
+    def retrieve_batch_with_status(self, queries: List[str], top_k: int = 3) -> Tuple[List[List[Dict]], List[int]]:
+        """
+        Retrieve relevant documents for several queries in one fan-out.
+
+        Returns:
+            (results per query, ids of shards missing from these results)
+        """
+        self.start()
+        query_embeddings = self.model.encode(queries)
+        faiss.normalize_L2(query_embeddings)
+        query_embeddings = query_embeddings.astype('float32')
+
+        with self._lock:
+            for shard in self.shards:
+                self._refresh(shard)
+
+            request_id = next(self._request_ids)
+            pending = {}
+            failed = []
+            for shard in self.shards:
+                if shard.state != "ready" or shard.busy_request is not None:
+                    failed.append(shard.shard_id)
+                    continue
+                try:
+                    shard.conn.send(("search", request_id, (query_embeddings, top_k)))
+                    pending[shard.conn] = shard
+                except (BrokenPipeError, OSError):
+                    self._fail(shard)
+                    failed.append(shard.shard_id)
+
+            hits = [[] for _ in queries]
+            deadline = time.monotonic() + self.shard_timeout + self.query_timeout * len(queries)
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                for conn in wait(list(pending), timeout=remaining):
+                    shard = pending.pop(conn)
+                    try:
+                        _, _, payload = conn.recv()
+                    except (EOFError, OSError):
+                        self._fail(shard)
+                        failed.append(shard.shard_id)
+                        continue
+                    for query_hits, shard_hits in zip(hits, payload):
+                        query_hits.extend(shard_hits)
+
+            # Slow but live shards keep running; their late reply is drained before their next query
+            for shard in pending.values():
+                self._mark_busy(shard, request_id)
+                failed.append(shard.shard_id)
+
+            failed = sorted(failed)
+            self.failed_shards = failed
+
+        results = []
+        for query_hits in hits:
+            top = heapq.nlargest(top_k, query_hits, key=lambda hit: (hit[0], -hit[1]))
+            results.append([
+                {
+                    "content": content,
+                    "metadata": metadata,
+                    "score": score,
+                    "rank": rank + 1
+                }
+                for rank, (score, _, content, metadata) in enumerate(top)
+            ])
+        return results, failed
+
+    def retrieve_batch(self, queries: List[str], top_k: int = 3) -> List[List[Dict]]:
+        """Retrieve relevant documents for several queries in one fan-out"""
+        return self.retrieve_batch_with_status(queries, top_k)[0]
+
+    def retrieve(self, query: str, top_k: int = 3) -> List[Dict]:
+        """Retrieve relevant documents for query"""
+        return self.retrieve_batch([query], top_k)[0]
+
+    def get_context(self, query: str, top_k: int = 3) -> str:
+        """Get formatted context for LLM"""
+        retrieved_docs = self.retrieve(query, top_k)
+        return self.format_context(retrieved_docs)
+
+    def format_context(self, retrieved_docs: List[Dict]) -> str:
+        """Format already-retrieved documents as LLM context"""
+        if not retrieved_docs:
+            return "No relevant information found in knowledge base."
+
+        context_parts = []
+        for doc in retrieved_docs:
+            context_parts.append(f"Source: {doc['metadata']['title']}\n{doc['content']}")
+
+        return "\n\n".join(context_parts)
+
+def _synthetic_corpus(size: int, seed: int = 0) -> List[Dict]:
+    """Vary the mock knowledge base into a larger corpus for benchmarking"""
+    from mock_data import TELCO_KNOWLEDGE_BASE
+
+    rng = np.random.default_rng(seed)
+    regions = ["EU", "US", "UK", "Asia", "Latin America", "Africa", "Oceania"]
+    products = ["5G router", "eSIM", "smartwatch", "home broadband", "prepaid SIM", "family plan"]
+    corpus = []
+    for i in range(size):
+        base = TELCO_KNOWLEDGE_BASE[i % len(TELCO_KNOWLEDGE_BASE)]
+        region = regions[rng.integers(len(regions))]
+        product = products[rng.integers(len(products))]
+        corpus.append({
+            "title": f"{base['title']} #{i}",
+            "content": f"{base['content']} Applies to {product} customers in {region} (article {i}).",
+            "category": base["category"]
+        })
+    return corpus
+
+def benchmark_sharded_retrieval(corpus_size: int = 20000, shard_counts: Optional[List[int]] = None,
+                                num_queries: int = 200, top_k: int = 5):
+    """Time index build and query throughput as the shard count grows"""
+    shard_counts = shard_counts or [1, 2, 4, 8]
+    corpus = _synthetic_corpus(corpus_size)
+    queries = [f"roaming charges for {product} in {region}"
+               for product, region in itertools.product(["eSIM", "5G router", "prepaid SIM", "smartwatch"],
+                                                        ["EU", "US", "Asia", "Africa", "Oceania"])]
+    queries = (queries * (num_queries // len(queries) + 1))[:num_queries]
+
+    workdir = tempfile.mkdtemp(prefix="rag-shards-bench-")
+    reference = None
+    print(f"Corpus: {corpus_size} documents, {num_queries} queries, top_k={top_k}")
+    for num_shards in shard_counts:
+        shard_path = os.path.join(workdir, f"shards_{num_shards}")
+        start = time.perf_counter()
+        write_shards(corpus, shard_path, num_shards)
+        build_time = time.perf_counter() - start
+        pipeline = ShardedTelcoRAGPipeline(shard_path)
+        try:
+            start = time.perf_counter()
+            pipeline.start()
+            open_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for query in queries:
+                pipeline.retrieve(query, top_k)
+            single_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            batched = pipeline.retrieve_batch(queries, top_k)
+            batch_time = time.perf_counter() - start
+        finally:
+            pipeline.close()
+
+        # Compare scores rather than ids, since tied documents may merge in any order
+        scores = [[round(doc["score"], 5) for doc in docs] for docs in batched]
+        if reference is None:
+            reference = scores
+        matches = sum(a == b for a, b in zip(reference, scores))
+        print(f"  {num_shards} shard(s): build={build_time:.2f}s open={open_time:.2f}s "
+              f"single={num_queries / single_time:.1f} q/s batched={num_queries / batch_time:.1f} q/s "
+              f"top-k matches 1-shard={matches}/{num_queries}")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    benchmark_sharded_retrieval()
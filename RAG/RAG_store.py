@@ -0,0 +1,178 @@
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import sys
+import tempfile
+import warnings
+from collections.abc import Sequence
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+STORE_VERSION = 2
+
+# Map flat-index vectors straight from the page cache. FAISS < 1.11 has no
+# IO_FLAG_MMAP_IFC and reads IndexFlat vectors into private memory instead.
+HAS_FLAT_MMAP = hasattr(faiss, "IO_FLAG_MMAP_IFC")
+INDEX_READ_FLAGS = faiss.IO_FLAG_MMAP_IFC if HAS_FLAT_MMAP else faiss.IO_FLAG_MMAP
+
+class MmapStringArray(Sequence):
+    """
+    Read-only list of strings backed by a memory-mapped UTF-8 blob and an
+    offsets array, so every process opening the store shares the same pages.
+    Only the items actually indexed are decoded.
+    """
+
+    def __init__(self, blob_path: str, offsets_path: str, as_json: bool = False):
+        self.offsets = np.load(offsets_path, mmap_mode='r')
+        self.as_json = as_json
+        with open(blob_path, "rb") as f:  # the mapping keeps its own handle
+            size = os.fstat(f.fileno()).st_size
+            self._blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        i = int(i)
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("store index out of range")
+        text = self._blob[int(self.offsets[i]):int(self.offsets[i + 1])].decode("utf-8")
+        return json.loads(text) if self.as_json else text
+
+def _write_strings(items: List[str], blob_path: str, offsets_path: str):
+    offsets = np.zeros(len(items) + 1, dtype=np.int64)
+    with open(blob_path, "wb") as blob:
+        for i, item in enumerate(items):
+            encoded = item.encode("utf-8")
+            blob.write(encoded)
+            offsets[i + 1] = offsets[i] + len(encoded)
+    np.save(offsets_path, offsets)
+
+def store_fingerprint(records: Iterable[Tuple[str, Dict]], model_name: str) -> str:
+    """Content hash of (document, metadata) records and the embedding model a store was built from"""
+    digest = hashlib.sha256(model_name.encode("utf-8"))
+    for document, meta in records:
+        digest.update(json.dumps([document, meta], sort_keys=True).encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+def knowledge_base_fingerprint(knowledge_base: Iterable[Dict], model_name: str) -> str:
+    """store_fingerprint computed by streaming over knowledge base dicts, without copying the corpus"""
+    records = ((doc["content"], {"title": doc["title"], "category": doc["category"]}) for doc in knowledge_base)
+    return store_fingerprint(records, model_name)
+
+def read_fingerprint(path: str) -> Optional[str]:
+    """Fingerprint recorded in a store's manifest, or None if there is no usable store"""
+    try:
+        with open(os.path.join(path, "manifest.json")) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != STORE_VERSION:
+        return None
+    return manifest.get("fingerprint")
+
+@contextmanager
+def store_lock(path: str, shared: bool = False) -> Iterator[None]:
+    """
+    Lock a store across processes. Readers take it shared, so many workers can
+    check and open the store at once; a rebuild takes it exclusive, so one
+    worker builds while the others wait.
+    """
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    with open(os.path.abspath(path) + ".lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def replace_directory(tmp_path: str, path: str):
+    """Move a fully written tmp_path to path, replacing (not merging into) any existing directory"""
+    if os.path.exists(path):
+        stale_path = tmp_path + ".old"
+        os.rename(path, stale_path)
+        os.rename(tmp_path, path)
+        shutil.rmtree(stale_path, ignore_errors=True)
+    else:
+        os.rename(tmp_path, path)
+
+def write_store(path: str, index, documents: List[str], metadata: List[Dict], model_name: str):
+    """
+    Write a FAISS index, document text and metadata as a memory-mappable store.
+
+    The store is assembled in a temporary sibling directory and renamed into
+    place, replacing any existing store. Processes that already mapped the old
+    files keep reading them until they reload. Hold store_lock while writing
+    if other processes may write or load the same path.
+    """
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    tmp_path = tempfile.mkdtemp(prefix=".store-", dir=parent)
+    try:
+        faiss.write_index(index, os.path.join(tmp_path, "index.faiss"))
+        _write_strings(list(documents), os.path.join(tmp_path, "documents.bin"),
+                       os.path.join(tmp_path, "documents.offsets.npy"))
+        _write_strings([json.dumps(m) for m in metadata], os.path.join(tmp_path, "metadata.bin"),
+                       os.path.join(tmp_path, "metadata.offsets.npy"))
+
+        manifest = {
+            "version": STORE_VERSION,
+            "model_name": model_name,
+            "count": index.ntotal,
+            "dimension": index.d,
+            "fingerprint": store_fingerprint(zip(documents, metadata), model_name)
+        }
+        with open(os.path.join(tmp_path, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+        replace_directory(tmp_path, path)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+def open_store(path: str) -> Tuple[object, MmapStringArray, MmapStringArray, Dict]:
+    """Open a store written by write_store; returns (index, documents, metadata, manifest)"""
+    with open(os.path.join(path, "manifest.json")) as f:
+        manifest = json.load(f)
+    if manifest.get("version") != STORE_VERSION:
+        raise ValueError(f"Unsupported store version {manifest.get('version')} in {path}")
+
+    if not HAS_FLAT_MMAP:
+        warnings.warn(
+            f"faiss {faiss.__version__} cannot memory-map IndexFlat vectors (needs faiss-cpu >= 1.11); "
+            "each process will hold a private copy of the embeddings",
+            RuntimeWarning
+        )
+    index = faiss.read_index(os.path.join(path, "index.faiss"), INDEX_READ_FLAGS)
+    documents = MmapStringArray(os.path.join(path, "documents.bin"),
+                                os.path.join(path, "documents.offsets.npy"))
+    metadata = MmapStringArray(os.path.join(path, "metadata.bin"),
+                               os.path.join(path, "metadata.offsets.npy"), as_json=True)
+    return index, documents, metadata, manifest
+
+if __name__ == "__main__":
+    # Build the shared store once per host before starting workers
+    from dotenv import load_dotenv
+    from rag_pipeline import TelcoRAGPipeline
+    from mock_data import TELCO_KNOWLEDGE_BASE
+
+    load_dotenv()
+    store_path = os.getenv("VECTOR_DB_PATH")
+    if not store_path:
+        sys.exit("VECTOR_DB_PATH is not set. Set it in .env or the environment to the store directory, "
+                 "then run: python RAG_store.py")
+
+    TelcoRAGPipeline.load_or_build(store_path, TELCO_KNOWLEDGE_BASE)
+    print(f"Store at {store_path} is up to date for {len(TELCO_KNOWLEDGE_BASE)} documents")